@@ -1,7 +1,14 @@
 # pyright: basic
 
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+
 
 class Point:
+    __slots__ = ("x", "y")
+
     def __init__(self, x: int, y: int) -> None:
         self.x = x
         self.y = y
@@ -17,40 +24,55 @@ class Point:
 
 
 class HistoricStrip:
-    def __init__(self, count: int) -> None:
-        self.full_row = [True] * count
-        self.history = []
+    __slots__ = ("full_row", "history", "_depth")
+
+    def __init__(self, count: int, capacity: int | None = None) -> None:
+        self.full_row = bytearray(b"\x01") * count
+        # Fixed-size undo stack; _depth marks the top.
+        self.history = array("l", [-1]) * (count if capacity is None else capacity)
+        self._depth = 0
 
     def set(self, n: int) -> None:
-        did_change = self.can_set(n)
-        self.history.append(
-                n if did_change else -1
-            )
-        self.full_row[n] = False
+        # Overflowing the preallocated history raises IndexError here.
+        self.history[self._depth] = n if self.full_row[n] else -1
+        self._depth += 1
+        self.full_row[n] = 0
 
     def can_set(self, n: int) -> bool:
-        return self.full_row[n]
+        return self.full_row[n] != 0
 
     def unset(self) -> None:
-        modified = self.history.pop()
+        if self._depth == 0:
+            raise IndexError("pop from empty strip history")
+        self._depth -= 1
+        modified = self.history[self._depth]
         if modified != -1:
-            self.full_row[modified] = True
+            self.full_row[modified] = 1
 
     def __str__(self) -> str:
-        return f"{self.full_row}: {self.history}"
+        full_row = [flag != 0 for flag in self.full_row]
+        return f"{full_row}: {self.history[:self._depth].tolist()}"
 
 
 class Board:
+    __slots__ = (
+        "n", "_cols", "_rows", "_diag_a", "_diag_b",
+        "_old_placements", "_placed",
+    )
+
     def __init__(self, n: int) -> None:
         self.n = n
+        # At most n queens fit, so every history only needs n entries.
         self._cols = HistoricStrip(n)
         self._rows = HistoricStrip(n)
 
         diag_count = (2*n)-1
-        self._diag_a = HistoricStrip(diag_count)  # ///
-        self._diag_b = HistoricStrip(diag_count)  # \\\
+        self._diag_a = HistoricStrip(diag_count, n)  # ///
+        self._diag_b = HistoricStrip(diag_count, n)  # \\\
 
-        self._old_placements = []
+        # Entries past _placed are stale and get overwritten on the next place.
+        self._old_placements: list[Point] = []
+        self._placed = 0
 
     def try_place(self, point) -> bool:
         valid = self.can_place(point)
@@ -59,7 +81,11 @@ class Board:
         return valid
 
     def _place(self, point) -> None:
-        self._old_placements.append(point)
+        if self._placed == len(self._old_placements):
+            self._old_placements.append(point)
+        else:
+            self._old_placements[self._placed] = point
+        self._placed += 1
         x, y = point.tup()
         self._cols.set(x)
         self._rows.set(y)
@@ -76,7 +102,7 @@ class Board:
         )
 
     def checkout_placements(self) -> list[Point]:
-        return self._old_placements.copy()
+        return self._old_placements[:self._placed]
 
     def undo_last_place(self):
         self._rows.unset()
@@ -84,27 +110,216 @@ class Board:
         self._diag_a.unset()
         self._diag_b.unset()
 
-        self._old_placements.pop()
+        self._placed -= 1
 
 
-def nQueensAll(rowcount):
-    if rowcount < 4:
-        raise ValueError("There exist no solutions for n<.4")
-    solutions = []
+def _board_walk(rowcount, prefix=()):
     board = Board(rowcount)
+    for row, col in enumerate(prefix):
+        if not board.try_place(Point(row, col)):
+            return
 
-    def _recurse(row, board: Board):
+    def _recurse(row):
         if row == rowcount:
-            solutions.append(board.checkout_placements())
+            yield tuple(pnt.y for pnt in board.checkout_placements())
             return
         for col in range(rowcount):
             if board.try_place(Point(row, col)):
-                _recurse(row+1, board)
+                yield from _recurse(row+1)
                 board.undo_last_place()
 
-    _recurse(0, board)
+    yield from _recurse(len(prefix))
+
+
+def _prefix_masks(rowcount, prefix):
+    full = (1 << rowcount) - 1
+    cols = diag_a = diag_b = 0
+    for col in prefix:
+        bit = 1 << col
+        if (cols | diag_a | diag_b) & bit:
+            return None
+        cols |= bit
+        diag_a = (diag_a | bit) >> 1
+        diag_b = ((diag_b | bit) << 1) & full
+    return cols, diag_a, diag_b
+
+
+def _bitmask_walk(rowcount, prefix=()):
+    # Columns and both diagonals live in ints; bit c blocks column c on the
+    # current row. Diagonal masks shift by one column per row descended.
+    full = (1 << rowcount) - 1
+    placed = [0] * rowcount
+    cols = [0] * rowcount
+    diag_a = [0] * rowcount  # ///
+    diag_b = [0] * rowcount  # \\\
+    free = [0] * rowcount
+
+    masks = _prefix_masks(rowcount, prefix)
+    if masks is None:
+        return
+    start = len(prefix)
+    placed[:start] = prefix
+    if start == rowcount:
+        yield tuple(placed)
+        return
+
+    next_cols, next_a, next_b = masks
+    cols[start] = next_cols
+    diag_a[start] = next_a
+    diag_b[start] = next_b
+    free[start] = full & ~(next_cols | next_a | next_b)
+    row = start
+    while row >= start:
+        options = free[row]
+        if not options:
+            row -= 1
+            continue
+        bit = options & -options  # lowest free column first, like range()
+        free[row] = options ^ bit
+        placed[row] = bit.bit_length() - 1
+        if row + 1 == rowcount:
+            yield tuple(placed)
+            continue
+
+        next_cols = cols[row] | bit
+        next_a = (diag_a[row] | bit) >> 1
+        next_b = ((diag_b[row] | bit) << 1) & full
+        row += 1
+        cols[row] = next_cols
+        diag_a[row] = next_a
+        diag_b[row] = next_b
+        free[row] = full & ~(next_cols | next_a | next_b)
+
+
+def _bitmask_count(rowcount, prefix=()):
+    masks = _prefix_masks(rowcount, prefix)
+    if masks is None:
+        return 0
+    full = (1 << rowcount) - 1
+
+    def _recurse(cols, diag_a, diag_b):
+        if cols == full:
+            return 1
+        total = 0
+        free = full & ~(cols | diag_a | diag_b)
+        while free:
+            bit = free & -free
+            free ^= bit
+            total += _recurse(
+                    cols | bit,
+                    (diag_a | bit) >> 1,
+                    ((diag_b | bit) << 1) & full
+                )
+        return total
+
+    return _recurse(*masks)
+
+
+_ENGINES = {
+    "board": _board_walk,
+    "bitmask": _bitmask_walk,
+}
+
+
+def _half_prefixes(rowcount):
+    # Every solution or its left-right mirror starts in the left half. For odd
+    # n the mirror of a middle-column start is another middle-column start, so
+    # the second row breaks the tie instead.
+    half = rowcount // 2
+    prefixes = [(col,) for col in range(half)]
+    if rowcount % 2:
+        prefixes += [(half, col) for col in range(half)]
+    return prefixes
+
+
+def _orbit(solution):
+    n = len(solution)
+    transposed = [0] * n
+    for row, col in enumerate(solution):
+        transposed[col] = row
+
+    orbit = set()
+    for base in (solution, tuple(transposed)):
+        flipped = base[::-1]
+        orbit.add(base)
+        orbit.add(flipped)
+        orbit.add(tuple(n-1-col for col in base))
+        orbit.add(tuple(n-1-col for col in flipped))
+    return orbit
+
+
+def _unique_walk(rowcount, engine):
+    walk = _ENGINES[engine]
+    for prefix in _half_prefixes(rowcount):
+        for solution in walk(rowcount, prefix):
+            orbit = _orbit(solution)
+            if solution == min(orbit):
+                yield solution, orbit
+
+
+def _prefix_solutions(rowcount, engine, prefix):
+    return list(_ENGINES[engine](rowcount, prefix))
+
+
+def _check_args(rowcount, engine):
+    if rowcount < 4:
+        raise ValueError("There exist no solutions for n<.4")
+    if engine not in _ENGINES:
+        raise ValueError(f"unknown engine {engine}")
+
+
+def iterNQueens(rowcount, engine="bitmask"):
+    # Yields one column per row, i.e. (c0, c1, ...) for [(0, c0), (1, c1), ...]
+    _check_args(rowcount, engine)
+    return _ENGINES[engine](rowcount)
+
+
+def nQueensAll(rowcount, engine="board", symmetric=False, count_only=False):
+    _check_args(rowcount, engine)
+    if count_only:
+        if symmetric:
+            return 2 * sum(
+                    _bitmask_count(rowcount, prefix)
+                    for prefix in _half_prefixes(rowcount)
+                )
+        return _bitmask_count(rowcount)
+
+    if symmetric:
+        solutions = sorted(
+                member
+                for _, orbit in _unique_walk(rowcount, engine)
+                for member in orbit
+            )
+    else:
+        solutions = _ENGINES[engine](rowcount)
 
     return [
-            [pnt.tup() for pnt in solution]
+            list(enumerate(solution))
             for solution in solutions
            ]
+
+
+def nQueensUnique(rowcount, engine="bitmask"):
+    _check_args(rowcount, engine)
+    return [
+            (list(enumerate(solution)), len(orbit))
+            for solution, orbit in _unique_walk(rowcount, engine)
+           ]
+
+
+def nQueensAllParallel(rowcount, workers=None, engine="bitmask", prefix_depth=1):
+    _check_args(rowcount, engine)
+    if prefix_depth not in (1, 2):
+        raise ValueError("prefix depth must be 1 or 2")
+
+    # product() emits prefixes in lexicographic order and map() keeps that
+    # order, so concatenating the chunks reproduces the serial output.
+    prefixes = list(product(range(rowcount), repeat=prefix_depth))
+    job = partial(_prefix_solutions, rowcount, engine)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = pool.map(job, prefixes)
+        return [
+                list(enumerate(solution))
+                for chunk in chunks
+                for solution in chunk
+               ]
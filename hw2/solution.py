@@ -1,7 +1,10 @@
 # pyright: basic
 
 from __future__ import annotations
+from array import array
 from enum import Enum
+import mmap
+import struct
 
 
 class Direction(Enum):
@@ -32,22 +35,19 @@ def trim(arr):
 
 
 def find(arr, val, allow_empty=False):
-    def findhelper(pos: int) -> int:
-        if allow_empty:
-            fillTo(arr, pos)
-            if arr[pos] is None:
+    pos = 0
+    while True:
+        if pos >= len(arr) or arr[pos] is None:
+            if allow_empty:
+                fillTo(arr, pos)
                 return pos
-        elif pos >= len(arr) or arr[pos] is None:
             return -1
 
         if val == arr[pos]:
             return pos
 
         direction = Direction.Left if val < arr[pos] else Direction.Right
-        nextpos = childOf(pos, direction)
-        return findhelper(nextpos)
-
-    return findhelper(0)
+        pos = childOf(pos, direction)
 
 
 def insert(arr, val):
@@ -68,23 +68,449 @@ def remove(arr, val):
     if (pos := find(arr, val)) == -1:
         return False
 
-    replacementind = findSuccessor(arr, pos)
-    if replacementind == -1:
-        arr[pos] = None
-        return True
+    # Each successor splice owes a write-back of the successor's right child
+    # once the removal below it finishes; replay them innermost first so the
+    # array ends up exactly as the recursive version left it.
+    pending = []
+    while True:
+        replacementind = findSuccessor(arr, pos)
+        if replacementind == -1:
+            arr[pos] = None
+            break
+
+        replacementval = arr[replacementind]
+        arr[pos] = replacementval
+
+        replacementchild = safeIndex(arr, childOf(replacementind, Direction.Right))
+        pending.append((replacementind, replacementchild))
+        if replacementchild is None:
+            break
+        if (pos := find(arr, replacementchild)) == -1:
+            break
+
+    while pending:
+        replacementind, replacementchild = pending.pop()
+        arr[replacementind] = replacementchild
+        trim(arr)
+    return True
+
+
+def inorder(arr, lo=None, hi=None):
+    # Yields stored values in ascending order, skipping left subtrees that
+    # are entirely below lo and stopping at the first value above hi.
+    stack = []
+    pos = 0
+    while True:
+        while (val := safeIndex(arr, pos)) is not None:
+            stack.append(pos)
+            if lo is not None and not lo < val:
+                break
+            pos = childOf(pos, Direction.Left)
+        if len(stack) == 0:
+            return
+
+        pos = stack.pop()
+        val = arr[pos]
+        if hi is not None and hi < val:
+            return
+        if lo is None or not val < lo:
+            yield val
+        pos = childOf(pos, Direction.Right)
+
+
+def subtreeSize(arr, pos):
+    count = 0
+    stack = [pos]
+    while len(stack) != 0:
+        pos = stack.pop()
+        if safeIndex(arr, pos) is not None:
+            count += 1
+            stack.append(childOf(pos, Direction.Left))
+            stack.append(childOf(pos, Direction.Right))
+    return count
+
+
+def countBelow(arr, val):
+    count = 0
+    pos = 0
+    while (cur := safeIndex(arr, pos)) is not None:
+        if cur < val:
+            count += 1 + subtreeSize(arr, childOf(pos, Direction.Left))
+            pos = childOf(pos, Direction.Right)
+        else:
+            pos = childOf(pos, Direction.Left)
+    return count
+
+
+def findBound(arr, val, below):
+    # Closest stored value on the requested side of val, or None.
+    best = None
+    pos = 0
+    while (cur := safeIndex(arr, pos)) is not None:
+        if cur == val:
+            return cur
+        if (cur < val) == below:
+            best = cur
+        direction = Direction.Left if val < cur else Direction.Right
+        pos = childOf(pos, direction)
+    return best
+
+
+def dedupeSorted(vals):
+    unique = []
+    for val in vals:
+        if len(unique) == 0 or unique[-1] != val:
+            unique.append(val)
+    return unique
+
+
+def layoutSorted(vals):
+    # Eytzinger layout: an in-order walk of the complete implicit tree with
+    # len(vals) slots receives the sorted values, so there are no holes and
+    # every level but the last is full.
+    arr = [None] * len(vals)
+    sortediter = iter(vals)
+    stack = []
+    pos = 0
+    while len(stack) != 0 or pos < len(arr):
+        while pos < len(arr):
+            stack.append(pos)
+            pos = childOf(pos, Direction.Left)
+        pos = stack.pop()
+        arr[pos] = next(sortediter)
+        pos = childOf(pos, Direction.Right)
+    return arr
 
-    replacementval = arr[replacementind]
-    arr[pos] = replacementval
 
-    replacementchild = safeIndex(arr, childOf(replacementind, Direction.Right))
-    if replacementchild is not None:
-        remove(arr, replacementchild)
-    arr[replacementind] = replacementchild
+def bulkInsert(arr, vals):
+    present = [val for val in arr if val is not None]
+    arr[:] = layoutSorted(dedupeSorted(sorted(present + list(vals))))
 
-    trim(arr)
+
+def bulkRemove(arr, vals):
+    present = sorted(val for val in arr if val is not None)
+    doomed = dedupeSorted(sorted(vals))
+    kept = []
+    ind = 0
+    for val in present:
+        if ind < len(doomed) and val == doomed[ind]:
+            ind += 1
+        else:
+            if ind < len(doomed) and doomed[ind] < val:
+                return False
+            kept.append(val)
+    if ind != len(doomed):
+        return False
+    arr[:] = layoutSorted(kept)
     return True
 
 
+class AVLTree:
+    # Self-balancing alternative to the implicit array layout. Nodes live in
+    # parallel lists and refer to each other by index, -1 meaning no child.
+    # Indices of deleted nodes are recycled through _free.
+
+    def __init__(self, keys=()) -> None:
+        self.keys = []
+        self.left: list[int] = []
+        self.right: list[int] = []
+        self.height: list[int] = []
+        self.root = -1
+        self._free: list[int] = []
+        self._count = 0
+        for k in keys:
+            self.insert(k)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        return self.inorder()
+
+    def inorder(self, lo=None, hi=None):
+        # Same bounded walk as the module-level inorder(), over node links.
+        stack = []
+        node = self.root
+        while True:
+            while node != -1:
+                stack.append(node)
+                if lo is not None and not lo < self.keys[node]:
+                    break
+                node = self.left[node]
+            if len(stack) == 0:
+                return
+
+            node = stack.pop()
+            val = self.keys[node]
+            if hi is not None and hi < val:
+                return
+            if lo is None or not val < lo:
+                yield val
+            node = self.right[node]
+
+    def rank(self, val) -> int:
+        # Nodes don't track subtree sizes, so this walks the smaller keys.
+        count = 0
+        for cur in self.inorder():
+            if not cur < val:
+                break
+            count += 1
+        return count
+
+    def bound(self, val, below: bool):
+        best = None
+        node = self.root
+        while node != -1:
+            cur = self.keys[node]
+            if cur == val:
+                return cur
+            if (cur < val) == below:
+                best = cur
+            node = self.left[node] if val < cur else self.right[node]
+        return best
+
+    def _h(self, node: int) -> int:
+        return 0 if node == -1 else self.height[node]
+
+    def _newnode(self, val) -> int:
+        self._count += 1
+        if self._free:
+            node = self._free.pop()
+            self.keys[node] = val
+            self.left[node] = self.right[node] = -1
+            self.height[node] = 1
+            return node
+        self.keys.append(val)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.height.append(1)
+        return len(self.keys) - 1
+
+    def _update(self, node: int) -> None:
+        self.height[node] = 1 + max(
+                self._h(self.left[node]),
+                self._h(self.right[node])
+            )
+
+    def _rotate_right(self, node: int) -> int:
+        pivot = self.left[node]
+        self.left[node] = self.right[pivot]
+        self.right[pivot] = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_left(self, node: int) -> int:
+        pivot = self.right[node]
+        self.right[node] = self.left[pivot]
+        self.left[pivot] = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rebalance(self, node: int) -> int:
+        self._update(node)
+        balance = self._h(self.left[node]) - self._h(self.right[node])
+        if balance > 1:
+            child = self.left[node]
+            if self._h(self.left[child]) < self._h(self.right[child]):
+                self.left[node] = self._rotate_left(child)
+            return self._rotate_right(node)
+        if balance < -1:
+            child = self.right[node]
+            if self._h(self.right[child]) < self._h(self.left[child]):
+                self.right[node] = self._rotate_right(child)
+            return self._rotate_left(node)
+        return node
+
+    def find(self, val) -> int:
+        node = self.root
+        while node != -1:
+            cur = self.keys[node]
+            if val == cur:
+                return node
+            node = self.left[node] if val < cur else self.right[node]
+        return -1
+
+    def insert(self, val) -> None:
+        def inserthelper(node: int) -> int:
+            if node == -1:
+                return self._newnode(val)
+            cur = self.keys[node]
+            if val == cur:
+                return node
+            if val < cur:
+                self.left[node] = inserthelper(self.left[node])
+            else:
+                self.right[node] = inserthelper(self.right[node])
+            return self._rebalance(node)
+
+        self.root = inserthelper(self.root)
+
+    def remove(self, val) -> bool:
+        removed = False
+
+        def removemin(node: int) -> tuple[int, int]:
+            if self.left[node] == -1:
+                return self.right[node], node
+            self.left[node], minnode = removemin(self.left[node])
+            return self._rebalance(node), minnode
+
+        def removehelper(node: int) -> int:
+            nonlocal removed
+            if node == -1:
+                return -1
+            cur = self.keys[node]
+            if val < cur:
+                self.left[node] = removehelper(self.left[node])
+            elif cur < val:
+                self.right[node] = removehelper(self.right[node])
+            else:
+                removed = True
+                self._count -= 1
+                self._free.append(node)
+                self.keys[node] = None
+                if self.left[node] == -1:
+                    return self.right[node]
+                if self.right[node] == -1:
+                    return self.left[node]
+                # Splice the in-order successor into this node's place.
+                rest, successor = removemin(self.right[node])
+                self.left[successor] = self.left[node]
+                self.right[successor] = rest
+                return self._rebalance(successor)
+            return self._rebalance(node)
+
+        self.root = removehelper(self.root)
+        return removed
+
+
+class TypedTree:
+    # Drop-in replacement for the list behind the implicit layout: integer
+    # keys are packed into an array with a bitmap marking occupied slots, and
+    # empty slots read back as None. Indexing matches the list exactly, so the
+    # functions above (and findKey positions) work on it unchanged.
+
+    _HEADER = struct.Struct("<4sc3xQ")
+    _MAGIC = b"BST1"
+
+    def __init__(self, vals=(), typecode: str = "q") -> None:
+        self.typecode = typecode
+        self.slots = array(typecode)
+        self.occupied = bytearray()
+        self += vals
+
+    def _own(self) -> None:
+        # Memory-mapped buffers can't change size, so copy them out first.
+        if not isinstance(self.slots, array):
+            self.slots = array(self.typecode, self.slots.tobytes())
+            self.occupied = bytearray(self.occupied)
+
+    def _isset(self, pos: int) -> bool:
+        return (self.occupied[pos >> 3] >> (pos & 7)) & 1 == 1
+
+    def _mark(self, pos: int, isset: bool) -> None:
+        if isset:
+            self.occupied[pos >> 3] |= 1 << (pos & 7)
+        else:
+            self.occupied[pos >> 3] &= ~(1 << (pos & 7))
+
+    def _index(self, pos: int) -> int:
+        if pos < 0:
+            pos += len(self.slots)
+        if not 0 <= pos < len(self.slots):
+            raise IndexError("tree index out of range")
+        return pos
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return list(self)[pos]
+        pos = self._index(pos)
+        return self.slots[pos] if self._isset(pos) else None
+
+    def __setitem__(self, pos, val) -> None:
+        if isinstance(pos, slice):
+            vals = list(self)
+            vals[pos] = val
+            self._own()
+            del self.slots[:]
+            self.occupied = bytearray()
+            self += vals
+            return
+        pos = self._index(pos)
+        if val is None:
+            self.slots[pos] = 0
+            self._mark(pos, False)
+        else:
+            self.slots[pos] = val
+            self._mark(pos, True)
+
+    def __iadd__(self, vals):
+        self._own()
+        vals = list(vals)
+        start = len(self.slots)
+        self.slots.frombytes(bytes(len(vals) * self.slots.itemsize))
+        self.occupied += bytes((len(self.slots)+7) // 8 - len(self.occupied))
+        for pos, val in enumerate(vals, start):
+            if val is not None:
+                self[pos] = val
+        return self
+
+    def __iter__(self):
+        for pos in range(len(self.slots)):
+            yield self.slots[pos] if self._isset(pos) else None
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def pop(self):
+        self._own()
+        val = self[-1]
+        self.slots.pop()
+        if len(self.slots) & 7 == 0:
+            self.occupied.pop()
+        else:
+            self._mark(len(self.slots), False)
+        return val
+
+    def save(self, path) -> None:
+        with open(path, "wb") as f:
+            f.write(self._HEADER.pack(
+                    self._MAGIC, self.typecode.encode(), len(self.slots)))
+            f.write(self.slots.tobytes())
+            f.write(bytes(self.occupied))
+
+    @classmethod
+    def load(cls, path, mapped: bool = False) -> TypedTree:
+        with open(path, "rb") as f:
+            if mapped:
+                # Copy-on-write mapping: edits stay private until save().
+                buf = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+            else:
+                buf = memoryview(f.read())
+        magic, typecode, count = cls._HEADER.unpack_from(buf)
+        if magic != cls._MAGIC:
+            raise ValueError("not a saved tree")
+
+        typecode = typecode.decode()
+        if typecode not in ("b", "B", "h", "H", "i", "I", "l", "L", "q", "Q"):
+            raise ValueError("not an integer tree")
+
+        tree = cls(typecode=typecode)
+        start = cls._HEADER.size
+        end = start + count * tree.slots.itemsize
+        if mapped:
+            tree.slots = buf[start:end].cast(typecode)
+            tree.occupied = buf[end:end + (count+7) // 8]
+        else:
+            tree.slots.frombytes(buf[start:end])
+            tree.occupied = bytearray(buf[end:end + (count+7) // 8])
+        return tree
+
+
 def checkNone(k, t):
     if k is None:
         raise ValueError("null key")
@@ -95,7 +521,10 @@ def checkNone(k, t):
 def findKey(k, t):
     checkNone(k, t)
     try:
-        res = find(t, k, allow_empty=False)
+        if isinstance(t, AVLTree):
+            res = t.find(k)
+        else:
+            res = find(t, k, allow_empty=False)
         if res == -1:
             raise LookupError("not in tree")
     except TypeError:
@@ -106,7 +535,10 @@ def findKey(k, t):
 def addKey(k, t):
     checkNone(k, t)
     try:
-        insert(t, k)
+        if isinstance(t, AVLTree):
+            t.insert(k)
+        else:
+            insert(t, k)
     except TypeError:
         raise Exception("tree error")
     return t
@@ -115,9 +547,110 @@ def addKey(k, t):
 def deleteKey(k, t):
     checkNone(k, t)
     try:
-        if not remove(t, k):
+        removed = t.remove(k) if isinstance(t, AVLTree) else remove(t, k)
+        if not removed:
             raise LookupError("not in tree")
         else:
             return t
     except TypeError:
         raise Exception("tree error")
+
+
+def addKeys(ks, t):
+    checkNone(ks, t)
+    try:
+        ks = list(ks)
+        if any(k is None for k in ks):
+            raise ValueError("null key")
+        if isinstance(t, AVLTree):
+            for k in ks:
+                t.insert(k)
+        else:
+            bulkInsert(t, ks)
+    except TypeError:
+        raise Exception("tree error")
+    return t
+
+
+def deleteKeys(ks, t):
+    checkNone(ks, t)
+    try:
+        ks = list(ks)
+        if any(k is None for k in ks):
+            raise ValueError("null key")
+        if isinstance(t, AVLTree):
+            if any(t.find(k) == -1 for k in ks):
+                raise LookupError("not in tree")
+            for k in ks:
+                t.remove(k)
+        elif not bulkRemove(t, ks):
+            raise LookupError("not in tree")
+        return t
+    except TypeError:
+        raise Exception("tree error")
+
+
+def rangeKeys(lo, hi, t):
+    checkNone(lo, t)
+    checkNone(hi, t)
+
+    def rangehelper():
+        try:
+            if isinstance(t, AVLTree):
+                yield from t.inorder(lo, hi)
+            else:
+                yield from inorder(t, lo, hi)
+        except TypeError:
+            raise Exception("tree error")
+
+    return rangehelper()
+
+
+def rank(k, t):
+    checkNone(k, t)
+    try:
+        return t.rank(k) if isinstance(t, AVLTree) else countBelow(t, k)
+    except TypeError:
+        raise Exception("tree error")
+
+
+def select(i, t):
+    checkNone(i, t)
+    if i < 0:
+        raise IndexError("rank out of range")
+    try:
+        vals = t.inorder() if isinstance(t, AVLTree) else inorder(t)
+        for ind, val in enumerate(vals):
+            if ind == i:
+                return val
+    except TypeError:
+        raise Exception("tree error")
+    raise IndexError("rank out of range")
+
+
+def floorKey(k, t):
+    checkNone(k, t)
+    try:
+        if isinstance(t, AVLTree):
+            res = t.bound(k, below=True)
+        else:
+            res = findBound(t, k, below=True)
+    except TypeError:
+        raise Exception("tree error")
+    if res is None:
+        raise LookupError("no key at or below")
+    return res
+
+
+def ceilingKey(k, t):
+    checkNone(k, t)
+    try:
+        if isinstance(t, AVLTree):
+            res = t.bound(k, below=False)
+        else:
+            res = findBound(t, k, below=False)
+    except TypeError:
+        raise Exception("tree error")
+    if res is None:
+        raise LookupError("no key at or above")
+    return res
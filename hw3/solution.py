@@ -1,38 +1,235 @@
 # pyright: basic
 
-from collections import Counter
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice, repeat
+import mmap
+import os
 
+try:
+    import numpy as np
+except ImportError:  # optional; only the "numpy" engine needs it
+    np = None
 
-def countPermStr(string1: str, string2: str):
+
+def checkPermArgs(string1, string2):
     if string2 == "" or string1 is None or string2 is None:
         raise ValueError()
 
-    str2len = len(string2)
-    if len(string1) < str2len:
+    if len(string1) < len(string2):
         raise ValueError()
 
+
+def countPermStr(string1: str, string2: str, engine="python", max_matches=None,
+                 workers=1):
+    checkPermArgs(string1, string2)
+
+    if workers != 1:
+        totalcount = countPermParallel(string1, string2, engine, workers)
+        if max_matches is not None:
+            totalcount = min(totalcount, max_matches)
+        return totalcount
+    if engine == "numpy" and np is not None:
+        totalcount = countPermStrVectorized(string1, string2)
+        if max_matches is not None:
+            totalcount = min(totalcount, max_matches)
+        return totalcount
+    if engine not in ("python", "numpy"):
+        raise ValueError(f"unknown engine {engine}")
+
+    return sum(1 for _ in iterPermMatches(string1, string2, max_matches))
+
+
+def countPermParallel(string1, string2, engine, workers):
+    # Each segment owns a contiguous run of window starts and extends
+    # len(string2)-1 characters past it, so every window lies wholly inside
+    # exactly one segment and the per-segment counts simply add up.
+    if workers is not None and workers < 1:
+        raise ValueError()
+    segments = workers or os.cpu_count() or 1
+    windows = len(string1) - len(string2) + 1
+    step = -(-windows // segments)
+    overlap = len(string2) - 1
+    pieces = [
+            string1[start:start + step + overlap]
+            for start in range(0, windows, step)
+        ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(countPermStr, pieces, repeat(string2), repeat(engine)))
+
+
+def iterPermMatches(string1: str, string2: str, max_matches=None):
+    # Lazy start offsets of matching windows; scanning stops once the caller
+    # stops pulling or max_matches offsets have been produced.
+    checkPermArgs(string1, string2)
+    matches = permMatches((string1,), string2)
+    if max_matches is not None:
+        matches = islice(matches, max_matches)
+    return matches
+
+
+def firstPermMatch(string1: str, string2: str) -> int:
+    return next(iterPermMatches(string1, string2), -1)
+
+
+def anyPermMatch(string1: str, string2: str) -> bool:
+    return firstPermMatch(string1, string2) != -1
+
+
+def permMatches(chunks, string2):
+    # Yields the start offset of every window that is a permutation of
+    # string2. The last len(string2) characters of each chunk are carried
+    # into the next one, so windows may straddle chunk boundaries.
+    str2len = len(string2)
     for_success = Counter(string2)
     in_window = Counter()
-    left_window = str2len * -1
     cur_matches = 0
     matches_for_full_perm = len(for_success)
-    totalcount = 0
+    carry = string2[:0]
+    base = 0  # offset of buf[0] in the whole input
+
+    for chunk in chunks:
+        buf = carry + chunk
+        for right_window in range(len(carry), len(buf)):
+            rchar = buf[right_window]
+            in_window[rchar] += 1
+            if for_success.get(rchar) == in_window[rchar]:
+                cur_matches += 1
+
+            left_window = right_window - str2len
+            if left_window >= 0:
+                lchar = buf[left_window]
+                if for_success.get(lchar) == in_window[lchar]:
+                    cur_matches -= 1
+                in_window[lchar] -= 1
+
+            if cur_matches == matches_for_full_perm:
+                yield base + left_window + 1
+
+        carry = buf[-str2len:]
+        base += len(buf) - len(carry)
 
-    for right_window in range(len(string1)):
-        rchar = string1[right_window]
-        in_window[rchar] += 1
-        if for_success.get(rchar) == in_window[rchar]:
-            cur_matches += 1
 
-        if left_window >= 0:
-            lchar = string1[left_window]
-            if for_success.get(lchar) == in_window[lchar]:
-                cur_matches -= 1
-            in_window[lchar] -= 1
+def iterChunks(source, chunk_size: int, mapped: bool):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if mapped and os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in range(0, len(mm), chunk_size):
+                        yield mm[start:start + chunk_size]
+                return
+            yield from iter(lambda: f.read(chunk_size), b"")
+    elif hasattr(source, "read"):
+        # Text files hit EOF at "" rather than b"", so stop on either.
+        while chunk := source.read(chunk_size):
+            yield chunk
+    else:
+        yield from source
 
-        if cur_matches == matches_for_full_perm:
-            totalcount += 1
-        
-        left_window += 1
 
+def countPermStream(source, string2, chunk_size=1 << 20, mapped=False,
+                    offsets=False, max_matches=None):
+    # source is a file path, a text or binary file object or an iterable of
+    # str or bytes chunks. Byte chunks are scanned byte-wise, so a str pattern
+    # is encoded to match them.
+    if string2 == "" or string2 is None or source is None:
+        raise ValueError()
+    if chunk_size <= 0:
+        raise ValueError()
+    # Nothing will be pulled from the source, so there is no length to check.
+    if max_matches == 0:
+        return (0, []) if offsets else 0
+
+    chunks = iterChunks(source, chunk_size, mapped)
+    first = next(chunks, None)
+    if first is not None:
+        if isinstance(first, str) != isinstance(string2, str):
+            if not isinstance(string2, str):
+                raise ValueError("bytes pattern for str chunks")
+            string2 = string2.encode()
+        chunks = chain((first,), chunks)
+    seen = 0
+
+    def countingChunks():
+        nonlocal seen
+        for chunk in chunks:
+            seen += len(chunk)
+            yield chunk
+
+    matches = permMatches(countingChunks(), string2)
+    if max_matches is not None:
+        matches = islice(matches, max_matches)
+    if offsets:
+        found = list(matches)
+        if seen < len(string2):
+            raise ValueError()
+        return len(found), found
+
+    totalcount = sum(1 for _ in matches)
+    if seen < len(string2):
+        raise ValueError()
     return totalcount
+
+
+def toCodes(text):
+    assert np is not None
+    if isinstance(text, str):
+        return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    return np.frombuffer(text, dtype=np.uint8)
+
+
+def countPermStrVectorized(string1, string2):
+    # A window matches when, for every character of string2, the count of
+    # that character inside it is right; the counts then already sum to the
+    # window length, so nothing else can be in the window. Counts for all
+    # windows come from differences of one cumulative sum per character.
+    assert np is not None
+    codes = toCodes(string1)
+    str2len = len(string2)
+    matched = np.ones(len(codes) - str2len + 1, dtype=bool)
+    for char, need in Counter(toCodes(string2).tolist()).items():
+        running = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(codes == char, out=running[1:])
+        matched &= (running[str2len:] - running[:-str2len]) == need
+    return int(np.count_nonzero(matched))
+
+
+def countPermStrMany(text: str, patterns):
+    patterns = list(patterns)
+    if text is None:
+        raise ValueError()
+    for pattern in patterns:
+        if pattern is None or pattern == "" or len(text) < len(pattern):
+            raise ValueError()
+
+    # Anagrams share a sorted-character signature, so each distinct
+    # signature is only counted once per window length.
+    by_length = defaultdict(set)
+    for pattern in patterns:
+        by_length[len(pattern)].add("".join(sorted(pattern)))
+
+    found = Counter()
+    for length, signatures in by_length.items():
+        countWindows(text, length, signatures, found)
+
+    return [found["".join(sorted(pattern))] for pattern in patterns]
+
+
+def countWindows(text: str, length: int, signatures, found: Counter):
+    # Windows are screened with an order-free additive hash of their
+    # characters; only hash hits are sorted and checked for real.
+    mask = (1 << 64) - 1
+    wanted = {}
+    for signature in signatures:
+        wanted.setdefault(sum(map(hash, signature)) & mask, set()).add(signature)
+
+    window_hash = sum(map(hash, text[:length - 1]))
+    for right_window in range(length - 1, len(text)):
+        window_hash = (window_hash + hash(text[right_window])) & mask
+        candidates = wanted.get(window_hash)
+        if candidates is not None:
+            left_window = right_window - length + 1
+            signature = "".join(sorted(text[left_window:right_window + 1]))
+            if signature in candidates:
+                found[signature] += 1
+        window_hash -= hash(text[right_window - length + 1])
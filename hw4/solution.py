@@ -1,10 +1,35 @@
 # pyright: basic
 
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from math import ceil, log
+from typing import NamedTuple
+import os
+import shutil
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:  # optional; only the "numpy" engine needs it
+    np = None
+
+
+class RadixPlan(NamedTuple):
+    base: int
+    passes: int
+
+
+def log2Exact(base: int) -> int | None:
+    shift = base.bit_length() - 1
+    return shift if base == 1 << shift else None
 
 
 def getMaxIterations(all_nums: list[int], base: int) -> int:
     max_num = max(all_nums)
+    if (shift := log2Exact(base)) is not None:
+        return -(-max_num.bit_length() // shift)
     iterations = 0
     while max_num > 0:
         iterations += 1
@@ -16,14 +41,21 @@ def radixHelper(numlist: list[int], base: int, iter_count: int):
     if iter_count == 0:
         return numlist
 
+    shift = log2Exact(base)
+    mask = base - 1
     tiered_sorted = numlist
     for exponent in range(iter_count):
         num_place = base**exponent
         starts_with = [[] for _ in range(base)]
 
-        for num in tiered_sorted:
-            digit = (num // num_place) % base
-            starts_with[digit].append(num)
+        if shift is not None:
+            num_shift = shift * exponent
+            for num in tiered_sorted:
+                starts_with[(num >> num_shift) & mask].append(num)
+        else:
+            for num in tiered_sorted:
+                digit = (num // num_place) % base
+                starts_with[digit].append(num)
 
         tiered_sorted = [
             sorted_num
@@ -34,16 +66,341 @@ def radixHelper(numlist: list[int], base: int, iter_count: int):
     return tiered_sorted
 
 
-def radix_base(values_to_sort: list[int], base: int):
+def countingRadixHelper(numlist: list[int], base: int, iter_count: int):
+    if iter_count == 0:
+        return numlist
+
+    # Count digits, turn counts into each digit's first free slot with an
+    # exclusive prefix sum, then scatter (recomputing the digit) into the
+    # other buffer. The input is only read, and the two n-slot buffers are
+    # the only n-sized allocations for the whole sort.
+    shift = log2Exact(base)
+    mask = base - 1
+    tiered_sorted = numlist
+    scratch = [0] * len(numlist)
+    spare = [0] * len(numlist) if iter_count > 1 else []
+    counts = [0] * base
+    num_place = 1
+    num_shift = 0
+    for exponent in range(iter_count):
+        for digit in range(base):
+            counts[digit] = 0
+        if shift is not None:
+            num_shift = shift * exponent
+            for num in tiered_sorted:
+                counts[(num >> num_shift) & mask] += 1
+        else:
+            for num in tiered_sorted:
+                counts[(num // num_place) % base] += 1
+
+        offset = 0
+        for digit in range(base):
+            counts[digit], offset = offset, offset + counts[digit]
+
+        if shift is not None:
+            for num in tiered_sorted:
+                digit = (num >> num_shift) & mask
+                scratch[counts[digit]] = num
+                counts[digit] += 1
+        else:
+            for num in tiered_sorted:
+                digit = (num // num_place) % base
+                scratch[counts[digit]] = num
+                counts[digit] += 1
+
+        if tiered_sorted is numlist:
+            tiered_sorted, scratch = scratch, spare
+        else:
+            tiered_sorted, scratch = scratch, tiered_sorted
+        num_place *= base
+
+    return tiered_sorted
+
+
+def numpyRadixHelper(numlist: list[int], base: int, iter_count: int):
+    # Values past uint64 (or a missing numpy) take the pure-Python path.
+    if np is None or max(numlist) >= 2**64:
+        return radixHelper(numlist, base, iter_count)
+    if iter_count == 0:
+        return numlist
+
+    shift = log2Exact(base) if base < 2**64 else None
+    tiered_sorted = np.array(numlist, dtype=np.uint64)
+    num_place = 1
+    for exponent in range(iter_count):
+        if shift is not None:
+            digits = (tiered_sorted >> (shift * exponent)) & (base - 1)
+        else:
+            digits = tiered_sorted // num_place
+            if base < 2**64:  # a larger base can't be a uint64; every digit fits
+                digits %= base
+        tiered_sorted = tiered_sorted[np.argsort(digits, kind="stable")]
+        num_place *= base
+
+    return tiered_sorted.tolist()
+
+
+_ENGINES = {
+    "buckets": radixHelper,
+    "counting": countingRadixHelper,
+    "numpy": numpyRadixHelper,
+}
+
+
+def radixPlan(values_to_sort: list[int]) -> RadixPlan:
+    # Power-of-two bases only, so digits come from shifts and masks. Each
+    # pass costs about one step per value plus one per bucket; pick the
+    # digit width with the cheapest total.
+    bits = max(values_to_sort).bit_length()
+    best = RadixPlan(2, bits)
+    best_cost = bits * (len(values_to_sort) + 2)
+    for width in range(2, 17):
+        passes = -(-bits // width)
+        cost = passes * (len(values_to_sort) + (1 << width))
+        if cost < best_cost:
+            best, best_cost = RadixPlan(1 << width, passes), cost
+    return best
+
+
+def checkRadixArgs(values_to_sort: list[int], base: int | str):
     if len(values_to_sort) == 0:
         raise ValueError()
-    if base <= 1 or not isinstance(base, int):
+    if base != "auto" and (not isinstance(base, int) or base <= 1):
         raise ValueError()
     for val in values_to_sort:
         if not isinstance(val, int) or val < 0:
             raise ValueError()
 
-    max_depth = getMaxIterations(values_to_sort, base)
-    sorted = radixHelper(values_to_sort, base, max_depth)
+
+def resolveBase(values_to_sort: list[int], base: int | str) -> RadixPlan:
+    if isinstance(base, int):
+        return RadixPlan(base, getMaxIterations(values_to_sort, base))
+    return radixPlan(values_to_sort)
+
+
+def radix_base(values_to_sort: list[int], base: int | str, engine="buckets"):
+    checkRadixArgs(values_to_sort, base)
+    if engine not in _ENGINES:
+        raise ValueError()
+
+    base, max_depth = resolveBase(values_to_sort, base)
+    sorted = _ENGINES[engine](values_to_sort, base, max_depth)
 
     return sorted
+
+
+def radix_sort(values_to_sort: list, base: int | str = "auto", key=None,
+               engine="buckets"):
+    if len(values_to_sort) == 0:
+        raise ValueError()
+    keys = values_to_sort if key is None else [key(val) for val in values_to_sort]
+    for k in keys:
+        if not isinstance(k, int):
+            raise ValueError()
+
+    # Shift everything up so the smallest key becomes 0.
+    offset = min(keys)
+    if key is None:
+        if offset >= 0:
+            return radix_base(keys, base, engine)
+        shifted = radix_base([k - offset for k in keys], base, engine)
+        return [k + offset for k in shifted]
+
+    # Pack each record's position below its key, so the ints are unique and
+    # ties come out in input order; then unpack the positions.
+    count = len(keys)
+    packed = [(k - offset) * count + pos for pos, k in enumerate(keys)]
+    return [
+            values_to_sort[code % count]
+            for code in radix_base(packed, base, engine)
+        ]
+
+
+def msdSplit(numlist: list[int], base: int, exponent: int):
+    # Returns the non-empty digit groups in digit order. Groups smaller than
+    # base are bucketed in a dict, so deep levels don't pay for base lists.
+    if (shift := log2Exact(base)) is not None:
+        num_shift = shift * exponent
+        mask = base - 1
+        digits = [(num >> num_shift) & mask for num in numlist]
+    else:
+        num_place = base**exponent
+        digits = [(num // num_place) % base for num in numlist]
+
+    if len(numlist) < base:
+        groups = {}
+        for digit, num in zip(digits, numlist):
+            groups.setdefault(digit, []).append(num)
+        return [groups[digit] for digit in sorted(groups)]
+
+    starts_with = [[] for _ in range(base)]
+    for digit, num in zip(digits, numlist):
+        starts_with[digit].append(num)
+    return [group for group in starts_with if len(group) != 0]
+
+
+def msdHelper(numlist: list[int], base: int, exponent: int, cutoff: int):
+    # Buckets at or below the cutoff (and the last digit) go to sorted(),
+    # which beats another bucketing pass on small or nearly uniform groups.
+    if len(numlist) <= cutoff or exponent < 0:
+        return sorted(numlist)
+
+    tiered_sorted = []
+    for group in msdSplit(numlist, base, exponent):
+        tiered_sorted += msdHelper(group, base, exponent - 1, cutoff)
+    return tiered_sorted
+
+
+def radix_msd(values_to_sort: list[int], base: int | str, cutoff=32, workers=1):
+    checkRadixArgs(values_to_sort, base)
+    if cutoff < 0 or (workers is not None and workers < 1):
+        raise ValueError()
+
+    # radixPlan is tuned for LSD, where each pass buckets the whole list once.
+    # MSD splits every group again at each level, so "auto" sticks to bytes.
+    if base == "auto":
+        base = 256
+    base, max_depth = resolveBase(values_to_sort, base)
+    top = max_depth - 1
+    if workers == 1 or len(values_to_sort) <= cutoff or top < 0:
+        return msdHelper(values_to_sort, base, top, cutoff)
+
+    # Top-level buckets are independent; map() keeps them in digit order.
+    groups = msdSplit(values_to_sort, base, top)
+    job = partial(msdHelper, base=base, exponent=top - 1, cutoff=cutoff)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [
+                sorted_num
+                for group in pool.map(job, groups)
+                for sorted_num in group
+            ]
+
+
+def readBlock(f, typecode: str, block_size: int):
+    block = array(typecode)
+    try:
+        block.fromfile(f, block_size)
+    except EOFError:  # short final block; what was read is kept
+        pass
+    return block
+
+
+def readBlocks(source, typecode: str, block_size: int):
+    # source is a path or binary file of raw array items, or an iterable of
+    # ints. Yields arrays of at most block_size items.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from readBlocks(f, typecode, block_size)
+    elif hasattr(source, "read"):
+        while len(block := readBlock(source, typecode, block_size)) != 0:
+            yield block
+    else:
+        source = iter(source)
+        while True:
+            try:
+                block = array(typecode, islice(source, block_size))
+            except (TypeError, OverflowError):
+                raise ValueError()
+            if len(block) == 0:
+                return
+            yield block
+
+
+def externalPass(path: str, workdir: str, base: int, exponent: int,
+                 typecode: str, budget: int) -> str:
+    # One LSD pass from file to file. Digit buckets are buffered in memory
+    # and appended to per-digit spill files whenever the buffers fill up.
+    shift = log2Exact(base)
+    mask = base - 1
+    num_place = base**exponent
+    spill = os.path.join(workdir, "bucket{}")
+    spilled = set()
+    starts_with = [array(typecode) for _ in range(base)]
+    itemsize = starts_with[0].itemsize
+    buffered = 0
+
+    def flush():
+        for digit, group in enumerate(starts_with):
+            if len(group) != 0:
+                with open(spill.format(digit), "ab") as f:
+                    group.tofile(f)
+                spilled.add(digit)
+                del group[:]
+
+    # A block of k items briefly costs 2k while it is read (raw bytes plus
+    # the array), and again while it is spread into the buffers, so reading
+    # at most half of the free room keeps everything within budget.
+    with open(path, "rb") as f:
+        while True:
+            room = (budget - buffered) // 2
+            if room == 0:
+                flush()
+                buffered = 0
+                continue
+            block = readBlock(f, typecode, room)
+            if len(block) == 0:
+                break
+            if shift is not None:
+                num_shift = shift * exponent
+                for num in block:
+                    starts_with[(num >> num_shift) & mask].append(num)
+            else:
+                for num in block:
+                    starts_with[(num // num_place) % base].append(num)
+            buffered += len(block)
+            del block
+    flush()
+    os.remove(path)
+
+    output = os.path.join(workdir, f"pass{exponent}")
+    with open(output, "wb") as out:
+        for digit in sorted(spilled):
+            with open(spill.format(digit), "rb") as f:
+                shutil.copyfileobj(f, out, budget * itemsize)
+            os.remove(spill.format(digit))
+    return output
+
+
+def externalBlocks(source, base: int, typecode: str, memory: int):
+    if not isinstance(base, int) or base <= 1:
+        raise ValueError()
+    if typecode not in ("b", "B", "h", "H", "i", "I", "l", "L", "q", "Q"):
+        raise ValueError()
+    itemsize = array(typecode).itemsize
+    # Items held at once, across the block being read and bucket buffers.
+    # Streaming phases read quarter-budget blocks: a read briefly holds the
+    # raw bytes next to the new array, and the loop variable keeps the
+    # previous block alive meanwhile.
+    budget = max(4, memory // itemsize)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        current = os.path.join(workdir, "input")
+        max_num = 0
+        with open(current, "wb") as out:
+            for block in readBlocks(source, typecode, budget // 4):
+                if min(block) < 0:
+                    raise ValueError()
+                max_num = max(max_num, max(block))
+                block.tofile(out)
+
+        for exponent in range(getMaxIterations([max_num], base)):
+            current = externalPass(current, workdir, base, exponent,
+                                   typecode, budget)
+        yield from readBlocks(current, typecode, budget // 4)
+
+
+def radix_external(source, base=256, typecode="Q", memory=1 << 24):
+    # Streams the sorted ints back; intermediate passes live in temp files.
+    for block in externalBlocks(source, base, typecode, memory):
+        yield from block
+
+
+def radix_external_file(source, dest, base=256, typecode="Q", memory=1 << 24):
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "wb") as out:
+            return radix_external_file(source, out, base, typecode, memory)
+    count = 0
+    for block in externalBlocks(source, base, typecode, memory):
+        block.tofile(dest)
+        count += len(block)
+    return count
@@ -2,7 +2,6 @@
 from collections.abc import Collection
 from math import e, modf, floor, sqrt
 from itertools import filterfalse, chain
-from copy import copy
 
 
 # DO NOT CHANGE ANY CODE BETWEEN LINE X AND LINE Y
@@ -43,28 +42,55 @@ class CuckooSet(Collection):
         return filterfalse((lambda x: x is None), tab)
 
     def _allmembers_(self):
-        return chain(self._members_(self.htab1), self._members_(self.htab2))
+        return chain(
+                self._members_(self.htab1),
+                self._members_(self.htab2),
+                self._stash_
+            )
 
     # ** course methods ****
 
-    def __init__(self, iter=[], *, s=128):
+    def __init__(self, iter=[], *, s=128, max_load=0.5, min_load=0.0,
+                 stash=4):
         if s < 4:
             raise ValueError("set size too small")
-        self._size_ = s
-        self._MAXSWAPS_ = floor(s * 0.6)
-        self.htab1 = [None] * s
-        self.htab2 = [None] * s
+        # Shrinking halves the table and doubles the load, so min_load has to
+        # stay under half of max_load or a shrink could push the load straight
+        # back over max_load.
+        if not 0.0 <= min_load < max_load / 2 or max_load > 1.0:
+            raise ValueError("bad load factor bounds")
+        self._max_load_ = max_load
+        self._min_load_ = min_load
+        self._min_size_ = s
+        self._stash_size_ = stash
+        self._setup_tables_(s)
+        self._count_ = 0
+        self._shrink_at_ = float("inf")
         for i in iter:
             self.add(i)
 
     def __len__(self):
-        count1 = len(list(self._members_(self.htab1)))
-        count2 = len(list(self._members_(self.htab2)))
-        return count1 + count2
+        return self._count_
 
-    def _resize_(self):
-        oldself = copy(self)
-        self.__init__(oldself, s=oldself._size_ * 2)
+    def _resize_(self, s=None):
+        # Rehash straight into fresh tables; if the stash overflows, start
+        # over at twice the size. A shrink that doesn't fit puts the old
+        # tables back and returns False instead of growing again.
+        members = list(self._allmembers_())
+        old = (self._size_, self._MAXSWAPS_, self.htab1, self.htab2,
+               self._stash_)
+        shrinking = s is not None and s < self._size_
+        s = self._size_ * 2 if s is None else s
+        while True:
+            self._setup_tables_(s)
+            if all(self._stow_(self._place_(m)) for m in members):
+                self._shrink_at_ = float("inf")
+                return True
+            if shrinking:
+                (self._size_, self._MAXSWAPS_, self.htab1, self.htab2,
+                 self._stash_) = old
+                return False
+            s *= 2
 
     def __str__(self):
         fstr = ""
@@ -78,11 +104,37 @@ class CuckooSet(Collection):
         return self._allmembers_()
 # ******* THIS IS LINE Y ******************
 
+    def _setup_tables_(self, s):
+        self._size_ = s
+        self._MAXSWAPS_ = floor(s * 0.6)
+        self.htab1 = [None] * s
+        self.htab2 = [None] * s
+        self._stash_ = []
+
+    def _stow_(self, homeless):
+        if homeless is None:
+            return True
+        if len(self._stash_) < self._stash_size_:
+            self._stash_.append(homeless)
+            return True
+        return False
+
     def __contains__(self, x) -> bool:
         if x is None:
             raise ValueError("key may not be None")
+        return self._locate_(x) is not None or x in self._stash_
+
+    def _locate_(self, x):
+        # (table, index) of the slot holding x, or None.
         h1, h2 = self._hash2_(x, self._size_)
-        return self.htab1[h1] == x or self.htab2[h2] == x
+        if self.htab1[h1] == x:
+            return self.htab1, h1
+        if self.htab2[h2] == x:
+            return self.htab2, h2
+        return None
+
+    def _capacity_(self):
+        return 2 * self._size_
 
     def add(self, x):
         if x is None:
@@ -91,14 +143,27 @@ class CuckooSet(Collection):
         if x in self:
             return
 
+        if self._count_ + 1 > self._max_load_ * self._capacity_():
+            self._resize_()
+        homeless = self._place_(x)
+        while not self._stow_(homeless):
+            self._resize_()
+            homeless = self._place_(homeless)
+        self._count_ += 1
+
+    def _place_(self, x):
+        # Runs the displacement chain for x. Returns None once everything has
+        # a slot, otherwise whichever element is left over after _MAXSWAPS_
+        # or once the chain repeats itself. The chain is deterministic, so the
+        # same element heading for the same table again means a cycle.
         swapcount = 0
-        is_not_added = True
         target = x
         array_oscilator = True
-        while is_not_added:
-            if swapcount >= self._MAXSWAPS_:
-                self._resize_()
-                swapcount = 0
+        visited = set()
+        while swapcount < self._MAXSWAPS_:
+            if (array_oscilator, target) in visited:
+                break
+            visited.add((array_oscilator, target))
             h1, h2 = self._hash2_(target, self._size_)
             if array_oscilator:
                 arr_target = self.htab1
@@ -109,7 +174,7 @@ class CuckooSet(Collection):
 
             if arr_target[arr_pos] is None:
                 arr_target[arr_pos] = target
-                is_not_added = False
+                return None
             else:
                 old_target = target
                 target = arr_target[arr_pos]
@@ -117,6 +182,10 @@ class CuckooSet(Collection):
 
             array_oscilator = not array_oscilator
             swapcount += 1
+        return target
+
+    def load_factor(self) -> float:
+        return self._count_ / self._capacity_()
 
     def remove(self, x):
         if not self.discard(x):
@@ -125,12 +194,85 @@ class CuckooSet(Collection):
     def discard(self, x) -> bool:
         if x is None:
             raise ValueError("key may not be None")
-        h1, h2 = self._hash2_(x, self._size_)
-        if self.htab1[h1] == x:
-            self.htab1[h1] = None
-            return True
-        elif self.htab2[h2] == x:
-            self.htab2[h2] = None
-            return True
+        if (slot := self._locate_(x)) is not None:
+            table, pos = slot
+            table[pos] = None
+        elif x in self._stash_:
+            self._stash_.remove(x)
         else:
             return False
+
+        self._count_ -= 1
+        # After a failed shrink, wait until the count has halved again before
+        # paying for another rehash.
+        shrink_below = min(self._min_load_ * self._capacity_(),
+                           self._shrink_at_)
+        if self._count_ < shrink_below and self._size_ // 2 >= self._min_size_:
+            if not self._resize_(self._size_ // 2):
+                self._shrink_at_ = self._count_ // 2
+        return True
+
+
+class BucketCuckooSet(CuckooSet):
+    # Each hash picks a bucket of _slots_ consecutive entries instead of a
+    # single slot, so htab1/htab2 are flat lists of _size_ * _slots_ entries.
+    # _hash2_ is still asked for bucket numbers, exactly as before.
+
+    def __init__(self, iter=[], *, s=32, slots=4, max_load=0.9, min_load=0.0,
+                 stash=4):
+        if slots < 1:
+            raise ValueError("bucket size too small")
+        self._slots_ = slots
+        super().__init__(iter, s=s, max_load=max_load, min_load=min_load,
+                         stash=stash)
+
+    def _setup_tables_(self, s):
+        super()._setup_tables_(s)
+        self.htab1 = [None] * (s * self._slots_)
+        self.htab2 = [None] * (s * self._slots_)
+
+    def _capacity_(self):
+        return 2 * self._size_ * self._slots_
+
+    def _locate_(self, x):
+        h1, h2 = self._hash2_(x, self._size_)
+        for table, bucket in ((self.htab1, h1), (self.htab2, h2)):
+            start = bucket * self._slots_
+            for pos in range(start, start + self._slots_):
+                if table[pos] == x:
+                    return table, pos
+        return None
+
+    def _place_(self, x):
+        # Takes any free slot in either bucket; only when both are full does
+        # it evict, rotating through the bucket so evictions spread out.
+        swapcount = 0
+        target = x
+        array_oscilator = True
+        visited = set()
+        while swapcount < self._MAXSWAPS_:
+            h1, h2 = self._hash2_(target, self._size_)
+            for table, bucket in ((self.htab1, h1), (self.htab2, h2)):
+                start = bucket * self._slots_
+                for pos in range(start, start + self._slots_):
+                    if table[pos] is None:
+                        table[pos] = target
+                        return None
+
+            if array_oscilator:
+                arr_target = self.htab1
+                arr_pos = h1 * self._slots_ + (swapcount // 2) % self._slots_
+            else:
+                arr_target = self.htab2
+                arr_pos = h2 * self._slots_ + (swapcount // 2) % self._slots_
+            if (array_oscilator, arr_pos, target) in visited:
+                break
+            visited.add((array_oscilator, arr_pos, target))
+
+            old_target = target
+            target = arr_target[arr_pos]
+            arr_target[arr_pos] = old_target
+
+            array_oscilator = not array_oscilator
+            swapcount += 1
+        return target